@@ -1,9 +1,107 @@
-import requests
+# requests, bs4 and selectolax are imported lazily inside the methods that
+# first need them, so --help and argument errors don't pay their import cost.
+from __future__ import annotations
+
 import argparse
-from bs4 import BeautifulSoup
-import pandas as pd  # Import pandas
+import hashlib
+import json
+import os
 import re
 import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# Cache shared by rapid re-invocations, e.g. viewing then ordering.
+# Files are keyed per username and written owner-only, and the cached list is
+# only ever served after that user has logged in successfully.
+_CACHE_DIR = Path.home() / ".cache" / "systmonline"
+_CACHE_TTL = 60  # seconds
+
+def _medication_cache_path(username: str) -> Path:
+    """
+    Returns the per-user medication cache path.
+
+    :param username: The username the cache entry belongs to.
+    :return: The cache file path, keyed by a hash of the username.
+    """
+    digest = hashlib.sha256(username.encode()).hexdigest()[:16]
+    return _CACHE_DIR / f"medications-{digest}.json"
+
+# Matches both medication dates in one pass over the details text.
+_DATES_RE = re.compile(
+    r"Last Issued:\s*(?P<issued>\d{1,2}\s[A-Za-z]{3}\s\d{4})"
+    r"|Last requested\s*(?P<requested>\d{1,2}\s[A-Za-z]{3}\s\d{2})"
+)
+
+# Matches the hidden-input type attribute regardless of the page's casing.
+_HIDDEN_TYPE_RE = re.compile(r"^hidden$", re.I)
+
+# Scans hidden inputs straight out of raw response bytes, no DOM required.
+_HIDDEN_INPUT_RE = re.compile(
+    rb'<input[^>]*\btype=["\']?HIDDEN["\']?[^>]*\bname=["\']([^"\']+)["\'][^>]*\bvalue=["\']([^"\']*)["\']',
+    re.I
+)
+
+def _bucket_form_fields(pairs) -> dict:
+    """
+    Builds a form-data dictionary from (name, value) pairs.
+
+    :param pairs: An iterable of form field names and values.
+    :return: A dictionary of form field names and values.
+             If multiple fields share the same name, values are stored in a list.
+    """
+    buckets = defaultdict(list)
+    for name, value in pairs:
+        buckets[name].append(value)
+
+    return {name: values[0] if len(values) == 1 else values for name, values in buckets.items()}
+
+def _load_cached_medications(username: str) -> list:
+    """
+    Loads the medication list cached by a recent run for this user.
+
+    :param username: The username the cache entry belongs to.
+    :return: The cached medication rows, or None if the cache is missing,
+             unreadable or older than the TTL.
+    """
+    try:
+        path = _medication_cache_path(username)
+        if time.time() - path.stat().st_mtime > _CACHE_TTL:
+            return None
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+def _save_medication_cache(username: str, medications: list):
+    """
+    Caches the medication list for rapid re-invocations. Best effort.
+    The file holds medical data, so it is written readable by the owner only.
+
+    :param username: The username the cache entry belongs to.
+    :param medications: The medication rows to cache.
+    """
+    try:
+        _CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(_medication_cache_path(username), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as handle:
+            json.dump(medications, handle)
+    except OSError:
+        pass
+
+def _to_iso_date(text: str, fmt: str) -> str:
+    """
+    Converts a date string to ISO format so rows sort lexicographically.
+
+    :param text: The date text extracted from the medication page.
+    :param fmt: The strptime format the page uses for this field.
+    :return: The ISO date string, or the original text if it doesn't parse.
+    """
+    try:
+        return datetime.strptime(text, fmt).date().isoformat()
+    except ValueError:
+        return text
 
 class SystmOnline:
     """
@@ -13,6 +111,11 @@ class SystmOnline:
     
     BASE_URL = "https://systmonline.tpp-uk.com"
 
+    # Strainer restricting soup construction to the forms we extract data from;
+    # the medication table itself is parsed separately with selectolax.
+    # Built lazily on first parse, alongside the bs4 import.
+    FORM_STRAINER = None
+
     def __init__(self, username: str, password: str):
         """
         Initializes the SystmOnline instance with user credentials.
@@ -20,11 +123,69 @@ class SystmOnline:
         :param username: The username for login
         :param password: The password for login
         """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
         self.ENDPOINT = self.BASE_URL
         self.session = requests.Session()
+
+        # Pool connections so each request sequence reuses one TCP+TLS
+        # connection. Transient gateway errors are retried only on the login
+        # and medication-query POSTs, where a replay is harmless; the
+        # RequestMedication POSTs stay on the non-retrying adapter because
+        # replaying the confirmation could submit a duplicate order. Retry
+        # must opt POST in explicitly, as urllib3 excludes it by default.
+        pool = {"pool_connections": 4, "pool_maxsize": 4}
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"}
+        )
+        retrying_adapter = HTTPAdapter(max_retries=retry, **pool)
+        self.session.mount("https://", HTTPAdapter(**pool))
+        self.session.mount(f"{self.BASE_URL}/2/Login", retrying_adapter)
+        self.session.mount(f"{self.BASE_URL}/2/Medication", retrying_adapter)
+        self.session.headers.update({
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Connection": "keep-alive",
+            "Accept-Encoding": "br, gzip, deflate"
+        })
+        self.session.cookies.set("CookieTest", "CookieTest")
+
         self.username = username
         self.password = password
         self.soup = None
+        self._form_cache = {}
+
+    def _parse(self, markup: bytes, forms_only: bool = False, from_encoding: str = None) -> "BeautifulSoup":
+        """
+        Parses an HTML response body with the C-backed lxml parser.
+
+        :param markup: The raw HTML bytes to parse.
+        :param forms_only: Whether to restrict tree construction to the forms.
+        :param from_encoding: The encoding reported by the HTTP response, if any.
+        :return: A BeautifulSoup object for the document.
+        """
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        if SystmOnline.FORM_STRAINER is None:
+            SystmOnline.FORM_STRAINER = SoupStrainer("form")
+
+        parse_only = self.FORM_STRAINER if forms_only else None
+        return BeautifulSoup(markup, "lxml", parse_only=parse_only, from_encoding=from_encoding)
+
+    def _set_soup(self, markup: bytes, forms_only: bool = False, from_encoding: str = None):
+        """
+        Replaces the current soup and drops form data cached for the old page.
+
+        :param markup: The raw HTML bytes to parse.
+        :param forms_only: Whether to restrict tree construction to the forms.
+        :param from_encoding: The encoding reported by the HTTP response, if any.
+        """
+        self.soup = self._parse(markup, forms_only=forms_only, from_encoding=from_encoding)
+        self._form_cache.clear()
 
     def login(self) -> tuple:
         """
@@ -38,13 +199,8 @@ class SystmOnline:
             "Login": ""
         }
         
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Cookie": "CookieTest=CookieTest"
-        }
-        
-        response = self.session.post(f"{self.ENDPOINT}/2/Login", data=payload, headers=headers)
-        self.soup = BeautifulSoup(response.text, "html.parser")
+        response = self.session.post(f"{self.ENDPOINT}/2/Login", data=payload)
+        self._set_soup(response.content, from_encoding=response.encoding)
         
         error_span = self.soup.find("span", {"id": "errorText"})
         
@@ -63,24 +219,48 @@ class SystmOnline:
         :return: A dictionary of form field names and values.
                  If multiple fields share the same name, values are stored in a list.
         """
-        form = self.soup.find("form", {"method": "POST", "action": action})
+        # Copies are returned so callers updating the form data with extra
+        # fields never mutate the cached entry in place
+        cache_key = (id(self.soup), action)
+        if cache_key in self._form_cache:
+            return dict(self._form_cache[cache_key])
+
+        form = self.soup.select_one(f'form[action="{action}"][method="POST"]')
         if not form:
             return None
 
-        form_data = {}
-        for input_tag in form.find_all("input", {"type": "HIDDEN"}):
-            name = input_tag.get("name")
-            value = input_tag.get("value", "")
+        form_data = _bucket_form_fields(
+            (input_tag.get("name"), input_tag.get("value", ""))
+            for input_tag in form.find_all("input", type=_HIDDEN_TYPE_RE)
+        )
+
+        self._form_cache[cache_key] = form_data
+        return dict(form_data)
+
+    def scan_hidden_fields(self, markup: bytes, action: str, encoding: str = None) -> dict:
+        """
+        Extracts hidden form data by scanning raw response bytes.
 
-            if name in form_data:
-                # Convert existing value into a list if it isn't already
-                if not isinstance(form_data[name], list):
-                    form_data[name] = [form_data[name]]
-                form_data[name].append(value)
-            else:
-                form_data[name] = value
+        Cheaper than a DOM parse for small, well-known forms such as the
+        order confirmation page.
+
+        :param markup: The raw HTML bytes of the page.
+        :param action: The action attribute of the form to be scanned.
+        :param encoding: The encoding reported by the HTTP response, if any.
+        :return: A dictionary of form field names and values, or None if the
+                 form or its hidden inputs cannot be found.
+        """
+        start = markup.find(f'action="{action}"'.encode())
+        if start == -1:
+            return None
+
+        end = markup.find(b"</form>", start)
+        pairs = _HIDDEN_INPUT_RE.findall(markup[start:end if end != -1 else len(markup)])
+        if not pairs:
+            return None
 
-        return form_data
+        charset = encoding or "utf-8"
+        return _bucket_form_fields((name.decode(charset), value.decode(charset)) for name, value in pairs)
 
     def query_medications(self, order_medications: bool = False, order_all: bool = False):
         """
@@ -93,30 +273,60 @@ class SystmOnline:
         if not post_data:
             print("Error: Unable to retrieve medication data.")
             return
-        
+
         response = self.session.post(f"{self.BASE_URL}/2/Medication", data=post_data)
-        self.soup = BeautifulSoup(response.text, "html.parser")
+
+        # The soup keeps only the forms needed for ordering later; the table is
+        # walked through selectolax's C parser, which is much faster here.
+        self._set_soup(response.content, forms_only=True, from_encoding=response.encoding)
+        medications = self._parse_medication_rows(response.content)
+        _save_medication_cache(self.username, medications)
+
+        self.display_medications(medications, order_medications, order_all)
+
+    def _parse_medication_rows(self, markup: bytes) -> list:
+        """
+        Parses the medication table rows out of a medication page.
+
+        :param markup: The raw HTML bytes of the medication page.
+        :return: A list of medications with details.
+        """
+        from selectolax.parser import HTMLParser
+
+        tree = HTMLParser(markup)
         medications = []
 
-        for row in self.soup.find_all("tr")[1:]:
-            columns = row.find_all("td")
+        # Skip the header row without copying the row list just to slice it
+        rows = iter(tree.css("tr"))
+        next(rows, None)
+
+        for row in rows:
+            columns = row.css("td")
             if len(columns) < 2:
                 continue
 
-            checkbox = row.find("input", {"type": "CHECKBOX"})
+            checkbox = row.css_first('input[type="CHECKBOX"]')
             can_order = "Yes" if checkbox else "No"
-            med_id = checkbox["value"] if checkbox else None
-            drug_name_tag = columns[1].find("h3")
+            med_id = checkbox.attributes.get("value") if checkbox else None
+            drug_name_tag = columns[1].css_first("h3")
 
             if drug_name_tag:
-                drug_name = drug_name_tag.text.strip()
-                details = columns[1].get_text("\n", strip=True).replace(drug_name, "")
-                last_issued = re.search(r"Last Issued:\s*(\d{1,2}\s[A-Za-z]{3}\s\d{4})", details)
-                last_requested = re.search(r"Last requested\s*(\d{1,2}\s[A-Za-z]{3}\s\d{2})", details)
-                
-                medications.append([med_id, drug_name, last_issued.group(1) if last_issued else "", last_requested.group(1) if last_requested else "", can_order])
+                drug_name = drug_name_tag.text(strip=True)
 
-        self.display_medications(medications, order_medications, order_all)
+                # Drop the h3 before collecting the details so the cell is
+                # walked once, instead of rebuilding the text to strip the name.
+                drug_name_tag.decompose()
+                details = columns[1].text(deep=True, separator="\n", strip=True)
+                last_issued = last_requested = ""
+                for match in _DATES_RE.finditer(details):
+                    if match.group("issued"):
+                        last_issued = _to_iso_date(match.group("issued"), "%d %b %Y")
+                    else:
+                        last_requested = _to_iso_date(match.group("requested"), "%d %b %y")
+
+                medications.append([med_id, drug_name, last_issued, last_requested, can_order])
+
+        return medications
 
     def display_medications(self, medications: list, order_medications: bool, order_all: bool):
         """
@@ -131,42 +341,49 @@ class SystmOnline:
             print("No medications found.")
             return
 
-        df = pd.DataFrame(medications, columns=["ID", "Drug Name", "Last Issued", "Last Requested", "Can Be Ordered"])
-        pd.set_option("display.max_colwidth", None)
-
         if order_medications:
-            df = df[df["Can Be Ordered"] == "Yes"]
+            medications = [m for m in medications if m[4] == "Yes"]
 
-            if df.empty:
+            if not medications:
                 print("No medications available for ordering.")
                 return
 
-            # Reset ids to 1
-            df = df.reset_index(drop=True)
-            df.index = df.index + 1
-            print(df[["Drug Name", "Last Issued", "Last Requested", "Can Be Ordered"]])
+            self.print_medications(medications)
 
-            selected_ids = df["ID"].tolist() if order_all else self.prompt_order_medications(df)
+            selected_ids = [m[0] for m in medications] if order_all else self.prompt_order_medications(medications)
             self.order_medications(selected_ids)
-        
+
         else:
-            df.index = df.index + 1
-            print(df[["Drug Name", "Last Issued", "Last Requested", "Can Be Ordered"]])
+            self.print_medications(medications)
 
-    def prompt_order_medications(self, df: pd.DataFrame) -> list:
+    def print_medications(self, medications: list):
+        """
+        Prints medications as a fixed-width table with 1-based indices.
+
+        :param medications: A list of medications with details.
+        """
+        headers = ["Drug Name", "Last Issued", "Last Requested", "Can Be Ordered"]
+        rows = [m[1:] for m in medications]
+        widths = [max(len(header), *(len(row[i]) for row in rows)) for i, header in enumerate(headers)]
+
+        index_width = len(str(len(rows)))
+        print(" " * index_width, "  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+        for index, row in enumerate(rows, start=1):
+            print(str(index).rjust(index_width), "  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+    def prompt_order_medications(self, medications: list) -> list:
         """
         Prompts the user to select medications to order.
-        
-        :param df: DataFrame containing medication details.
+
+        :param medications: A list of orderable medications with details.
         :return: A list of selected medication IDs.
         """
         try:
             user_input = input("\nEnter the medication indices to order (comma separated, e.g. 1,2,5): ")
-            selected_indices = [(int(x.strip())-1) for x in user_input.split(",")]
-            ordered_medications = df.iloc[selected_indices].reset_index(drop=True)
-            print("\nOrdered medications:", ", ".join(ordered_medications["Drug Name"].tolist()))
-            return ordered_medications["ID"].tolist()
-        except ValueError:
+            selected = [medications[int(x.strip()) - 1] for x in user_input.split(",")]
+            print("\nOrdered medications:", ", ".join(m[1] for m in selected))
+            return [m[0] for m in selected]
+        except (ValueError, IndexError):
             print("Invalid input. Please enter numbers separated by commas.")
             return []
 
@@ -188,10 +405,13 @@ class SystmOnline:
 
         post_data.update({"Drug": med_ids, "MedRequestType": "Request existing medication"})
         response = self.session.post(f"{self.BASE_URL}/2/RequestMedication", data=post_data)
-        self.soup = BeautifulSoup(response.text, "html.parser")
 
-        # Confirm medication
-        post_data = self.extract_form_data("RequestMedication")
+        # Confirm medication: scan the confirmation form off the raw bytes,
+        # falling back to a full parse if the scan comes up empty
+        post_data = self.scan_hidden_fields(response.content, "RequestMedication", response.encoding)
+        if post_data is None:
+            self._set_soup(response.content, forms_only=True, from_encoding=response.encoding)
+            post_data = self.extract_form_data("RequestMedication")
 
         if not post_data:
             print("Error: Unable to retrieve request form.")
@@ -201,6 +421,149 @@ class SystmOnline:
         response = self.session.post(f"{self.BASE_URL}/2/RequestMedication", data=post_data)
         print("Medication request submitted successfully." if response.ok else "Error submitting medication request.")
 
+class AsyncSystmOnline(SystmOnline):
+    """
+    An aiohttp-based variant of SystmOnline for overlapping the network I/O of
+    several accounts, e.g. fetching medications for a whole family at once.
+    Parsing and form-data extraction are shared with the sync class; only the
+    transport differs. Use as an async context manager; query_medications
+    returns the rows instead of displaying them.
+    """
+
+    def __init__(self, username: str, password: str):
+        """
+        Initializes the AsyncSystmOnline instance with user credentials.
+
+        :param username: The username for login
+        :param password: The password for login
+        """
+        self.ENDPOINT = self.BASE_URL
+        self.session = None
+        self.username = username
+        self.password = password
+        self.soup = None
+        self._form_cache = {}
+
+    async def __aenter__(self):
+        import aiohttp
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=8, keepalive_timeout=60),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            cookies={"CookieTest": "CookieTest"}
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def _post(self, path: str, data: dict) -> tuple:
+        """
+        Sends a POST request and reads the full response body.
+
+        :param path: The path below the endpoint to post to.
+        :param data: The form data; list values are expanded to repeated fields.
+        :return: A tuple of the response and its raw body bytes.
+        """
+        fields = [(name, value)
+                  for name, values in data.items()
+                  for value in (values if isinstance(values, list) else [values])]
+
+        async with self.session.post(f"{self.ENDPOINT}{path}", data=fields) as response:
+            return response, await response.read()
+
+    async def login(self) -> tuple:
+        """
+        Logs into the SystmOnline portal.
+
+        :return: A tuple containing a success flag (bool) and an error message (str) if applicable.
+        """
+        payload = {
+            "Username": self.username,
+            "Password": self.password,
+            "Login": ""
+        }
+
+        response, body = await self._post("/2/Login", payload)
+        self._set_soup(body, from_encoding=response.charset)
+
+        error_span = self.soup.find("span", {"id": "errorText"})
+
+        if error_span:
+            return False, error_span.text.strip()
+        elif "MainMenu" in str(response.url):
+            return True, ""
+        else:
+            return False, "Login status unknown. Check the response."
+
+    async def query_medications(self) -> list:
+        """
+        Queries the medication list.
+
+        :return: A list of medications with details.
+        """
+        post_data = self.extract_form_data("Medication")
+        if not post_data:
+            print("Error: Unable to retrieve medication data.")
+            return []
+
+        response, body = await self._post("/2/Medication", post_data)
+        self._set_soup(body, forms_only=True, from_encoding=response.charset)
+        return self._parse_medication_rows(body)
+
+    async def order_medications(self, med_ids: list):
+        """
+        Submits medication order requests.
+
+        :param med_ids: A list of medication IDs to be ordered.
+        """
+        if not med_ids:
+            print("No medications selected for ordering.")
+            return
+
+        # Request medication
+        post_data = self.extract_form_data("RequestMedication")
+        if not post_data:
+            print("Error: Unable to retrieve request form.")
+            return
+
+        post_data.update({"Drug": med_ids, "MedRequestType": "Request existing medication"})
+        response, body = await self._post("/2/RequestMedication", post_data)
+
+        # Confirm medication: scan the confirmation form off the raw bytes,
+        # falling back to a full parse if the scan comes up empty
+        post_data = self.scan_hidden_fields(body, "RequestMedication", response.charset)
+        if post_data is None:
+            self._set_soup(body, forms_only=True, from_encoding=response.charset)
+            post_data = self.extract_form_data("RequestMedication")
+
+        if not post_data:
+            print("Error: Unable to retrieve request form.")
+            return
+
+        # Send request
+        response, body = await self._post("/2/RequestMedication", post_data)
+        print("Medication request submitted successfully." if response.ok else "Error submitting medication request.")
+
+async def fetch_all_medications(credentials: list) -> list:
+    """
+    Fetches medication lists for several accounts concurrently.
+
+    :param credentials: A list of (username, password) tuples.
+    :return: A list of medication lists, one per account, in input order.
+    """
+    import asyncio
+
+    async def fetch(username: str, password: str) -> list:
+        async with AsyncSystmOnline(username, password) as account:
+            success, message = await account.login()
+            if not success:
+                print(f"Error for {username}: {message}")
+                return []
+            return await account.query_medications()
+
+    return await asyncio.gather(*(fetch(username, password) for username, password in credentials))
+
 # Parse command-line arguments
 def parse_arguments():
     """
@@ -214,15 +577,19 @@ def parse_arguments():
     parser.add_argument("--medications", action="store_true", help="Query medications")
     parser.add_argument("--order-medications", action="store_true", help="Order specific medications")
     parser.add_argument("--all", action="store_true", help="Order all medications when combined with --order-medications")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the recently cached medication list and always fetch")
     return parser
 
 # Main execution logic
-if __name__ == "__main__":
-
-    args = parse_arguments().parse_args()
+def main():
+    """
+    Runs the command-line interface.
+    """
+    parser = parse_arguments()
+    args = parser.parse_args()
 
     if not args.medications and not args.order_medications:
-        parse_arguments().print_help()
+        parser.print_help()
         sys.exit(1)
 
     systm_online = SystmOnline(args.username, args.password)
@@ -231,4 +598,16 @@ if __name__ == "__main__":
         print(f"Error: {message}")
         sys.exit(1)
 
+    # Serve a view-only query from this user's cache left by a recent run,
+    # but only now that their credentials have been verified; ordering always
+    # talks to the live site.
+    if not args.order_medications and not args.no_cache:
+        cached = _load_cached_medications(args.username)
+        if cached:
+            systm_online.display_medications(cached, False, False)
+            return
+
     systm_online.query_medications(order_medications=args.order_medications, order_all=args.all)
+
+if __name__ == "__main__":
+    main()